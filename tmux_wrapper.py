@@ -18,37 +18,492 @@ Usage:
 """
 
 import click
+import json
+import math
+import os
 import subprocess
 import time
 import sys
+import queue
 import re
-from typing import Optional, Tuple
+import select
+import shlex
+import shutil
+import tempfile
+import threading
+import uuid
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Absolute path to tmux for the per-poll subprocesses: CPython only spawns with posix_spawn
+# (no fork page-table copy) when the executable has a directory part; since 3.13 it does so
+# with the default close_fds=True too, where posix_spawn can close fds (glibc >= 2.34)
+TMUX_PATH = shutil.which("tmux") or "tmux"
 
 # Pre-compile regex for stripping ANSI escape sequences produced by colorized prompts
-ANSI_ESCAPE_PATTERN = re.compile(r"\x1B[@-_][0-?]*[ -/]*[@-~]")
-
-
-def capture_tmux_output(session_name: str, lines: int = 100) -> str:
-    """Capture output from a tmux session."""
+# (captures are matched as bytes and only decoded once, for the final output)
+ANSI_ESCAPE_PATTERN = re.compile(rb"\x1B[@-_][0-?]*[ -/]*[@-~]")
+
+# Prompt patterns that indicate command is done (or waiting for input)
+_PROMPT_TUPLE = (
+    b"pry(main)>",  # Rails console
+    b"]$",          # Bash prompt like [user@host dir]$
+    b"]#",          # Root bash prompt like [root@host dir]#
+    b"#",           # Shell prompt with #
+    b"$",           # Shell prompt with $
+    b">",           # Shell prompt with >
+    b"(END)",       # less pager at end of output
+    b":",           # vim-like pager prompt (when alone at end of line)
+)
+
+# Scrollback lines captured (on top of the visible pane) for the returned output, and for each
+# poll, which only needs the end of the pane; the pre-command snapshot uses the poll size too
+OUTPUT_CAPTURE_LINES = 100
+POLL_CAPTURE_LINES = 2
+
+# Output printed after a prompt that does not show on screen: whitespace, CSI sequences,
+# OSC sequences (e.g. shell-integration marks like `\e]133;B\a`), other escapes and C0 controls
+_NON_PRINTING = (
+    rb"\x1b\[[0-?]*[ -/]*[@-~]"
+    rb"|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)"
+    rb"|\x1b[ -/]*[0-~]"
+    rb"|[\x00-\x08\x0e-\x1a\x1c-\x1f]"
+    rb"|\s"
+)
+
+# Any prompt pattern at the end of the output, tolerating trailing non-printing output
+_PROMPT_END = re.compile(
+    rb"(?:" + b"|".join(re.escape(p) for p in _PROMPT_TUPLE) + rb")(?:" + _NON_PRINTING + rb")*\Z"
+)
+PROMPT_SEARCH_WINDOW = 512  # bytes at the end of the output searched for a prompt
+
+# Pane output streamed through `tmux pipe-pane` (or control-mode `%output`) wakes the wait as
+# soon as a prompt is printed, so polls are only a safety net (e.g. for prompts that redraw
+# with cursor movement) that follows the idle backoff
+STREAM_TAIL_BYTES = 4096
+
+# Marker echoed after a command in --sentinel mode; its exact appearance means the command finished
+SENTINEL_PREFIX = "__TWDONE_"
+
+# Log of how long past commands took to complete, used to place polls where completions cluster
+COMPLETION_TIMES_PATH = Path.home() / ".cache" / "tmux_wrapper" / "completion_times.json"
+MAX_COMPLETION_SAMPLES = 500
+MIN_SCHEDULE_SAMPLES = 10
+SCHEDULE_POLLS = 20
+SCHEDULE_RESOLUTION = 0.05  # seconds
+SCHEDULE_MAX_GAP = 0.5  # seconds, the idle backoff cap: the schedule never polls less often than the backoff
+SCHEDULE_MARGIN = 1.0  # seconds of histogram past the slowest logged completion
+
+# How long a positive has-session result is trusted when polling without a control client
+SESSION_CHECK_TTL = 0.5  # seconds
+_session_check_cache: Dict[str, float] = {}
+
+
+def _capture_tmux_output_bytes(session_name: str, lines: int = OUTPUT_CAPTURE_LINES) -> bytes:
+    """Capture raw (undecoded) output from a tmux session."""
     try:
         result = subprocess.run(
-            ["tmux", "capture-pane", "-t", session_name, "-p", "-S", f"-{lines}"],
+            [TMUX_PATH, "capture-pane", "-t", session_name, "-p", "-S", f"-{lines}"],
             capture_output=True,
-            text=True,
             timeout=5
         )
         return result.stdout
     except subprocess.TimeoutExpired:
-        return ""
+        return b""
     except subprocess.CalledProcessError:
-        return ""
+        return b""
+
+
+def _unescape_control_output(value: bytes) -> bytes:
+    """Undo the octal escaping tmux applies to `%output` values in control mode."""
+    if b"\\" not in value:
+        return value
+    return re.sub(rb"\\([0-7]{3})", lambda m: bytes([int(m.group(1), 8)]), value)
+
+
+def _quote_tmux_arg(arg: str) -> str:
+    """Quote an argument for a command line sent to a tmux control-mode client."""
+    return "'" + arg.replace("'", "'\\''") + "'"
+
+
+class _TmuxControl:
+    """
+    Long-lived `tmux -C` client for a session.
+
+    Commands are written to the client's stdin and their output is read back
+    from the `%begin`/`%end` (or `%error`) framed responses on stdout, so each
+    poll costs a pipe round trip instead of a tmux fork/exec.
+
+    A background thread reads stdout: framed responses are handed to the
+    caller through a queue, and notifications are used to notice the client
+    going away (`%exit`, EOF, or being switched to another session after a
+    destroy), so the session check needs no round trip at all. `%output`
+    for the target pane is kept as a rolling tail so wait_for_prompt() can
+    return as soon as the pane prints a prompt.
+    """
+
+    def __init__(self, session_name: str, timeout: float = 5):
+        self.session_name = session_name
+        self.timeout = timeout
+        self.closed = False
+        self._session_id: Optional[bytes] = None
+        self._pane_id: Optional[bytes] = None
+        self._output_tail = b""
+        self._prompt_seen = threading.Event()
+        self._responses: "queue.Queue[Optional[Tuple[bool, List[bytes]]]]" = queue.Queue()
+        self._proc = subprocess.Popen(
+            ["tmux", "-C", "attach-session", "-t", session_name],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        self._reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self._reader.start()
+        # The attach completes in the background; wait_attached() collects it
+        self._attached: Optional[bool] = None
+
+    @classmethod
+    def start(cls, session_name: str) -> Optional["_TmuxControl"]:
+        """Start attaching a control client in the background; see wait_attached."""
+        try:
+            return cls(session_name)
+        except OSError:
+            return None
+
+    @classmethod
+    def open(cls, session_name: str) -> Optional["_TmuxControl"]:
+        """Start a control client, or return None if one cannot be attached."""
+        control = cls.start(session_name)
+        if control is None or not control.wait_attached():
+            return None
+        return control
+
+    def wait_attached(self) -> bool:
+        """Wait until the client is attached and knows its pane; False if that failed."""
+        if self._attached is None:
+            # The attach itself produces the first framed response. Commands are only
+            # sent after it, since tmux may answer stdin before finishing the attach
+            attach = self._next_response()
+            pane = None
+            if attach is not None and attach[0] and self._send(
+                f"display-message -p -t {_quote_tmux_arg(self.session_name)} '#{{pane_id}}'"
+            ):
+                pane = self._next_response()
+            self._attached = bool(attach and attach[0] and pane and pane[0] and pane[1])
+            if self._attached:
+                self._pane_id = pane[1][0]
+            else:
+                self.close()
+        return self._attached and not self.closed
+
+    def _read_stdout(self) -> None:
+        """Reader thread: queue framed responses and watch notifications."""
+        guard = None
+        body: List[bytes] = []
+        for line in self._proc.stdout:
+            line = line.rstrip(b"\n")
+            if guard is not None:
+                # The guard fields (time, command number, flags) identify the matching %end/%error
+                if line == b"%end " + guard or line == b"%error " + guard:
+                    self._responses.put((line.startswith(b"%end"), body))
+                    guard = None
+                    body = []
+                else:
+                    body.append(line)
+            elif line.startswith(b"%begin "):
+                guard = line[len(b"%begin "):]
+            elif line.startswith(b"%output "):
+                parts = line.split(b" ", 2)
+                if len(parts) == 3 and parts[1] == self._pane_id:
+                    self._output_tail = (self._output_tail + _unescape_control_output(parts[2]))[-STREAM_TAIL_BYTES:]
+                    if _PROMPT_END.search(self._output_tail):
+                        self._prompt_seen.set()
+            elif line.startswith(b"%session-changed "):
+                session_id = line.split(b" ")[1]
+                if self._session_id is None:
+                    self._session_id = session_id
+                elif session_id != self._session_id:
+                    break
+            elif line.startswith(b"%exit"):
+                break
+        self.closed = True
+        self._responses.put(None)
+        self._prompt_seen.set()
+
+    def _next_response(self) -> Optional[Tuple[bool, List[bytes]]]:
+        """Wait for the next framed response as (ok, lines), or None if the client is gone."""
+        try:
+            response = self._responses.get(timeout=self.timeout)
+        except queue.Empty:
+            response = None
+        if response is None:
+            # Responses would no longer line up with commands
+            self.closed = True
+        return response
+
+    def _send(self, command_line: str) -> bool:
+        """Write a command line to the client; False if it is gone."""
+        try:
+            self._proc.stdin.write(command_line.encode("utf-8") + b"\n")
+            self._proc.stdin.flush()
+        except OSError:
+            self.closed = True
+            return False
+        return True
+
+    def command(self, command_line: str) -> Optional[Tuple[bool, List[bytes]]]:
+        """Run a tmux command through the client; returns (ok, output lines) or None if closed."""
+        if not self.wait_attached() or not self._send(command_line):
+            return None
+        return self._next_response()
+
+    def capture(self, lines: int = OUTPUT_CAPTURE_LINES) -> bytes:
+        """Capture raw output from the session, like _capture_tmux_output_bytes."""
+        response = self.command(
+            f"capture-pane -t {_quote_tmux_arg(self.session_name)} -p -S -{lines}"
+        )
+        if response is None or not response[0]:
+            return b""
+        return b"".join(line + b"\n" for line in response[1])
+
+    def wait_for_prompt(self, timeout: float) -> bool:
+        """
+        Wait up to timeout seconds for the pane to print something ending in a prompt.
+
+        Returns True early on such output or when the client goes away,
+        False once the timeout has elapsed.
+        """
+        # Only a consumed wakeup is cleared: a prompt seen after a timeout
+        # stays pending and ends the next wait right away
+        woke = self._prompt_seen.wait(timeout)
+        if woke:
+            self._prompt_seen.clear()
+        return woke
+
+    def close(self) -> None:
+        """Detach the client and reap the process."""
+        self.closed = True
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+        self._reader.join(timeout=self.timeout)
+        self._proc.stdout.close()
+
+
+class _PaneStream:
+    """
+    Everything written to a pane, pushed into a FIFO by `tmux pipe-pane`.
+
+    Waiting on the FIFO with select() wakes up only when the pane produces
+    output, instead of on every poll tick.
+    """
+
+    def __init__(self, session_name: str):
+        self.session_name = session_name
+        self.closed = False
+        self.tail = b""
+        self._dir = tempfile.mkdtemp(prefix="tmux_wrapper_")
+        self.path = os.path.join(self._dir, "pane.fifo")
+        os.mkfifo(self.path, 0o600)
+        # Non-blocking so opening does not wait for tmux to start the writer
+        self._fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+
+    def pipe_command(self) -> List[str]:
+        """
+        tmux command (without the leading `tmux`) that starts piping the pane into the FIFO.
+
+        It does nothing if the pane already pipes somewhere else (pipe-pane
+        would close that pipe). Callers check `#{pane_pipe}` beforehand and
+        must then discard this stream with close(stop_pipe=False).
+        """
+        pipe_pane = " ".join(
+            _quote_tmux_arg(arg)
+            for arg in ["pipe-pane", "-o", "-t", self.session_name, f"cat > {shlex.quote(self.path)}"]
+        )
+        return ["if-shell", "-F", "-t", self.session_name, "#{?pane_pipe,,1}", pipe_pane]
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait up to timeout seconds for pane output.
+
+        Returns True early when the streamed output ends with a prompt or the
+        writer went away (pane closed), False once the timeout has elapsed.
+        """
+        if self.closed:
+            time.sleep(timeout)
+            return False
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if not ready:
+                return False
+            try:
+                chunk = os.read(self._fd, 65536)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                self.closed = True
+                return True
+            self.tail = (self.tail + chunk)[-STREAM_TAIL_BYTES:]
+            if _PROMPT_END.search(self.tail):
+                return True
+
+    def close(self, stop_pipe: bool = True, control: Optional[_TmuxControl] = None) -> None:
+        """Stop piping the pane (through control if it is open) and remove the FIFO."""
+        if stop_pipe and control is not None and not control.closed:
+            control.command(f"pipe-pane -t {_quote_tmux_arg(self.session_name)}")
+        elif stop_pipe:
+            try:
+                subprocess.run(["tmux", "pipe-pane", "-t", self.session_name], capture_output=True, timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+        self.closed = True
+        os.close(self._fd)
+        os.unlink(self.path)
+        os.rmdir(self._dir)
+
+
+def load_completion_times() -> List[float]:
+    """Load logged completion times (seconds), or an empty list if none are available."""
+    try:
+        with open(COMPLETION_TIMES_PATH) as f:
+            samples = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if not isinstance(samples, list):
+        return []
+    return [float(x) for x in samples if isinstance(x, (int, float)) and x >= 0]
+
+
+def record_completion_time(elapsed: float) -> None:
+    """Append a completion time to the on-disk log, keeping only the most recent samples."""
+    samples = load_completion_times()
+    samples.append(round(elapsed, 3))
+    samples = samples[-MAX_COMPLETION_SAMPLES:]
+    try:
+        COMPLETION_TIMES_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = COMPLETION_TIMES_PATH.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(samples, f)
+        os.replace(tmp_path, COMPLETION_TIMES_PATH)
+    except OSError:
+        pass
+
+
+def compute_poll_schedule(
+    samples: List[float],
+    max_wait_sec: float,
+    polls: int = SCHEDULE_POLLS,
+    resolution: float = SCHEDULE_RESOLUTION
+) -> List[float]:
+    """
+    Compute poll times in (0, max_wait_sec] that minimize the expected detection delay.
+
+    The completion-time density p is estimated from a histogram of the samples
+    (mixed with a small uniform floor so p never vanishes). Optimal poll times
+    satisfy L_{i+1} = L_i + (F(L_i) - F(L_{i-1})) / p(L_i), so the schedule is
+    determined by the first poll time; candidates for it are tried on a
+    geometric grid and the one with the lowest expected detection delay wins.
+    Steps are clamped to [resolution, SCHEDULE_MAX_GAP]; once the schedule is
+    exhausted the caller falls back to its own backoff (assumed ~0.5s).
+
+    The histogram only spans the samples plus SCHEDULE_MARGIN, so its size
+    does not grow with max_wait_sec; past it the density is the uniform floor.
+
+    Returns an empty list when there are too few samples to be useful.
+    """
+    if max_wait_sec <= 0:
+        return []
+    samples = sorted(x for x in samples if x <= max_wait_sec)
+    if len(samples) < MIN_SCHEDULE_SAMPLES or polls < 1:
+        return []
+
+    horizon = min(max_wait_sec, samples[-1] + SCHEDULE_MARGIN)
+    bins = max(1, math.ceil(horizon / resolution))
+    counts = [0] * bins
+    for x in samples:
+        counts[min(int(x / resolution), bins - 1)] += 1
+
+    floor = 0.05
+    floor_density = floor / max_wait_sec
+    density = [
+        (1 - floor) * c / (len(samples) * resolution) + floor_density
+        for c in counts
+    ]
+    cdf = [0.0]
+    for d in density:
+        cdf.append(cdf[-1] + d * resolution)
+    histogram_end = bins * resolution
+
+    def p(t: float) -> float:
+        if t >= histogram_end:
+            return floor_density
+        return density[min(int(t / resolution), bins - 1)]
+
+    def F(t: float) -> float:
+        if t >= histogram_end:
+            return cdf[-1] + floor_density * (t - histogram_end)
+        idx = min(int(t / resolution), bins - 1)
+        return cdf[idx] + density[idx] * (t - idx * resolution)
+
+    def schedule_from(first: float) -> List[float]:
+        points = [first]
+        prev = 0.0
+        while len(points) < polls:
+            cur = points[-1]
+            step = (F(cur) - F(prev)) / p(cur)
+            nxt = cur + min(max(step, resolution), SCHEDULE_MAX_GAP)
+            if nxt >= max_wait_sec:
+                break
+            points.append(nxt)
+            prev = cur
+        return points
+
+    def expected_delay(points: List[float]) -> float:
+        # Mean wait from completion to the next poll, for the observed samples
+        # plus the uniform floor's share; past the schedule, assume ~0.25s
+        def delay(x: float) -> float:
+            idx = bisect_left(points, x)
+            return points[idx] - x if idx < len(points) else 0.25
+
+        observed = sum(delay(x) for x in samples) / len(samples)
+        gaps = [b - a for a, b in zip([0.0] + points, points)]
+        tail = max_wait_sec - points[-1]
+        uniform = (sum(g * g for g in gaps) / 2 + 0.25 * tail) / max_wait_sec
+        return (1 - floor) * observed + floor * uniform
+
+    best: List[float] = []
+    best_delay = float("inf")
+    first = resolution
+    while first < max_wait_sec:
+        points = schedule_from(first)
+        delay = expected_delay(points)
+        if delay < best_delay:
+            best, best_delay = points, delay
+        first *= 1.15
+    return best
 
 
 def wait_for_output_completion(
     session_name: str,
     command_sent: Optional[str] = None,
     max_wait_sec: int = 20,
-    pre_command_output: Optional[str] = None
+    pre_command_output: Optional[bytes] = None,
+    use_control_mode: bool = True,
+    pane_stream: Optional[_PaneStream] = None,
+    completion_sentinel: Optional[str] = None,
+    control: Optional[_TmuxControl] = None
 ) -> Tuple[str, bool, bool]:
     """
     Wait until tmux output shows a prompt indicating command completion.
@@ -58,76 +513,276 @@ def wait_for_output_completion(
     - Rails console: 'pry(main)>'
     - Bash prompt with '#'
 
+    Polls go through a persistent `tmux -C` client when use_control_mode is
+    set, falling back to one tmux subprocess per poll otherwise. A client
+    already started with _TmuxControl.start may be passed as control; the
+    caller then remains responsible for closing it. Captures are
+    handled as raw bytes; only the returned output is decoded. With a
+    pane_stream (or else the control client's `%output`), the wait between
+    polls ends early when the pane prints a prompt.
+
+    If completion_sentinel is given (see _sentinel_suffix), the command is
+    done exactly when the sentinel shows up in the pane, and prompt patterns
+    are not consulted; the sentinel and its echo are removed from the output.
+
     Returns:
         (final_output, timed_out, session_exited)
     """
-    start_time = time.time()
-    poll_interval = 0.1  # 100ms polling
-
-    # Prompt patterns that indicate command is done (or waiting for input)
-    prompt_patterns = [
-        "pry(main)>",  # Rails console
-        "]$",          # Bash prompt like [user@host dir]$
-        "]#",          # Root bash prompt like [root@host dir]#
-        "#",           # Shell prompt with #
-        "$",           # Shell prompt with $
-        ">",           # Shell prompt with >
-        "(END)",       # less pager at end of output
-        ":",           # vim-like pager prompt (when alone at end of line)
-    ]
+    # Encoded once; every poll tests for the command in raw captures
+    command = command_sent.encode("utf-8") if command_sent else None
+    sentinel = completion_sentinel.encode("utf-8") if completion_sentinel else None
+
+    owns_control = control is None and use_control_mode
+    if owns_control:
+        control = _TmuxControl.open(session_name)
+    elif control is not None and not control.wait_attached():
+        control = None
+    try:
+        output, timed_out, session_exited = _poll_for_completion(
+            session_name, command, max_wait_sec, pre_command_output, control, pane_stream, sentinel
+        )
+    finally:
+        if owns_control and control is not None:
+            control.close()
+
+    if completion_sentinel:
+        output = output.replace(_sentinel_suffix(completion_sentinel).encode("utf-8"), b"")
+        output = output.replace(sentinel + b"\n", b"")
+    return output.decode("utf-8", errors="replace"), timed_out, session_exited
+
+
+def _sentinel_suffix(sentinel: str) -> str:
+    """
+    Shell code appended to a command to print the sentinel once it finishes.
+
+    The sentinel is split across two quoted words, so the typed (and echoed)
+    command line never contains it verbatim. The command's exit status is
+    restored afterwards, so `$?` in the session is left as the command set it.
+    """
+    head, tail = sentinel[:len(SENTINEL_PREFIX)], sentinel[len(SENTINEL_PREFIX):]
+    return f'; __twrc=$?; echo "{head}""{tail}"; (exit $__twrc)'
+
+
+def _sentinel_unsupported(keys: str) -> Optional[str]:
+    """
+    Why _sentinel_suffix cannot be appended to keys, or None if it can.
+
+    A trailing `&`, `;` or `|` turns the joined line into a syntax error, a
+    comment swallows the echo, and an open quote or trailing backslash pulls
+    it into the command. Quotes and escapes are tracked just enough to find
+    those; anything subtler is left to the shell.
+    """
+    quote = None
+    escaped = False
+    prev = " "
+    last = ""  # last unquoted, unescaped non-blank character
+    for ch in keys:
+        if escaped:
+            escaped = False
+            last = "a"
+        elif quote:
+            if ch == quote:
+                quote = None
+            elif ch == "\\" and quote == '"':
+                escaped = True
+            last = "a"
+        elif ch == "\\":
+            escaped = True
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "#" and (prev.isspace() or prev in ";&|()<>"):
+            return "ends in a comment"
+        elif not ch.isspace():
+            last = ch
+        prev = ch
+
+    if quote or escaped:
+        return "has an unterminated quote or a trailing backslash"
+    if last in ("&", ";", "|"):
+        return f"ends with '{last}'"
+    return None
+
+
+def _poll_for_completion(
+    session_name: str,
+    command: Optional[bytes],
+    max_wait_sec: int,
+    pre_command_output: Optional[bytes],
+    control: Optional[_TmuxControl],
+    pane_stream: Optional[_PaneStream],
+    sentinel: Optional[bytes] = None
+) -> Tuple[bytes, bool, bool]:
+    """Polling loop behind wait_for_output_completion; returns the output undecoded."""
+    start_time = time.monotonic()
+    deadline = start_time + max_wait_sec
+    # Adaptive backoff: poll fast right after activity, slow down while idle
+    idle_count = 0
+    # Poll times placed according to how long past commands took, if enough are logged;
+    # only computed once a wait actually falls back to a plain sleep
+    poll_schedule: Optional[List[float]] = None
+
+    def next_poll_interval() -> float:
+        nonlocal poll_schedule
+        if poll_schedule is None:
+            poll_schedule = compute_poll_schedule(load_completion_times(), max_wait_sec)
+        return _next_poll_interval(idle_count, poll_schedule, time.monotonic() - start_time)
 
     # Capture initial output to avoid matching stale prompts
-    initial_output = pre_command_output if pre_command_output is not None else capture_tmux_output(session_name)
+    initial_output = (
+        pre_command_output if pre_command_output is not None
+        else _capture(session_name, control, POLL_CAPTURE_LINES)
+    )
     last_output = initial_output
     output_changed = pre_command_output is None
     command_seen = False
 
-    if command_sent and command_sent in initial_output:
+    if command and command in initial_output:
         command_seen = True
 
+    # Snapshot the prompt check last ran on; identical captures need no re-check
+    last_checked_output = None
     poll_count = 0
 
     while True:
         poll_count += 1
-        elapsed = time.time() - start_time
 
         # Check timeout first
-        if elapsed > max_wait_sec:
-            current_output = capture_tmux_output(session_name)
-            return _trim_output_to_command(current_output, command_sent), True, False
+        if time.monotonic() > deadline:
+            current_output = _capture(session_name, control, OUTPUT_CAPTURE_LINES)
+            return _trim_output_to_command(current_output, command), True, False
 
         # Check if session still exists
-        if not session_exists(session_name):
-            current_output = capture_tmux_output(session_name)
-            return _trim_output_to_command(current_output, command_sent), False, True
+        if not _session_alive(session_name, control):
+            current_output = _capture(session_name, control, OUTPUT_CAPTURE_LINES)
+            return _trim_output_to_command(current_output, command), False, True
 
-        current_output = capture_tmux_output(session_name)
+        current_output = _capture(session_name, control, POLL_CAPTURE_LINES)
 
-        if command_sent and command_sent in current_output and not command_seen:
-            command_seen = True
+        if current_output == last_checked_output:
+            idle_count += 1
+            _wait_for_activity(pane_stream, control, idle_count, next_poll_interval)
+            continue
 
-        # Track if output has changed from initial state
+        # Track if output has changed from initial state. An unchanged snapshot
+        # was already searched for the command (initial_output or last poll)
         if current_output != last_output:
             output_changed = True
             last_output = current_output
-
-        # Only check for prompts after output has changed or the command is visible
-        trimmed_output = _trim_output_to_command(current_output, command_sent)
+            idle_count = 0
+            if not command_seen and command and command in current_output:
+                command_seen = True
+        else:
+            idle_count += 1
+
+        # Only check for prompts after output has changed or the command is visible;
+        # until the command has been seen there is nothing to trim to
+        trimmed_output = _trim_output_to_command(current_output, command) if command_seen else current_output
         check_prompts = (output_changed or command_seen) and trimmed_output
 
-        if check_prompts:
-            last_line = trimmed_output.strip().split('\n')[-1].strip() if trimmed_output.strip() else ""
-            clean_last_line = strip_ansi_escape_sequences(last_line)
+        if sentinel is not None:
+            done = sentinel in current_output
+        else:
+            done = check_prompts and _ends_with_prompt(trimmed_output)
+
+        if done:
+            # Only plain-polling waits follow the schedule, so only they feed its log
+            if not _watching_output(pane_stream, control):
+                record_completion_time(time.monotonic() - start_time)
+            final_output = _capture(session_name, control, OUTPUT_CAPTURE_LINES)
+            return _trim_output_to_command(final_output, command), False, False
+
+        last_checked_output = current_output
+
+        _wait_for_activity(pane_stream, control, idle_count, next_poll_interval)
+
 
-            # Check if line ends with any prompt pattern
-            for pattern in prompt_patterns:
-                if clean_last_line.endswith(pattern):
-                    return _trim_output_to_command(current_output, command_sent), False, False
+def _backoff_interval(idle_count: int) -> float:
+    """Seconds between polls after idle_count polls without new output."""
+    # 50ms -> 100ms -> 200ms -> 400ms while idle, capped at 500ms
+    return min(0.5, 0.05 * (2 ** min(idle_count, 3)))
 
-        time.sleep(poll_interval)
 
+def _next_poll_interval(idle_count: int, poll_schedule: List[float], elapsed: float) -> float:
+    """Seconds to sleep before the next poll."""
+    poll_interval = _backoff_interval(idle_count)
 
-def _trim_output_to_command(output: str, command: Optional[str]) -> str:
+    # While idle, follow the precomputed schedule until it is exhausted
+    next_idx = bisect_right(poll_schedule, elapsed)
+    if idle_count > 0 and next_idx < len(poll_schedule):
+        poll_interval = poll_schedule[next_idx] - elapsed
+
+    return poll_interval
+
+
+def _wait_for_activity(
+    pane_stream: Optional[_PaneStream],
+    control: Optional[_TmuxControl],
+    idle_count: int,
+    poll_interval: Callable[[], float]
+) -> None:
+    """
+    Sleep until the next poll, waking early if the pane prints a prompt.
+
+    Pane output is watched through the pane stream, or else through the
+    control client's `%output` notifications, either way polling at the idle
+    backoff; with neither, this is a plain sleep for poll_interval(), which
+    is only called in that case.
+    """
+    if pane_stream is not None and not pane_stream.closed:
+        pane_stream.wait(_backoff_interval(idle_count))
+    elif control is not None and not control.closed:
+        control.wait_for_prompt(_backoff_interval(idle_count))
+    else:
+        time.sleep(poll_interval())
+
+
+def _watching_output(pane_stream: Optional[_PaneStream], control: Optional[_TmuxControl]) -> bool:
+    """Whether _wait_for_activity can wake on pane output rather than plainly sleeping."""
+    return (pane_stream is not None and not pane_stream.closed) or (control is not None and not control.closed)
+
+
+def _capture(session_name: str, control: Optional[_TmuxControl], lines: int = OUTPUT_CAPTURE_LINES) -> bytes:
+    """Capture pane output through the control client while it is open."""
+    if control is not None and not control.closed:
+        return control.capture(lines)
+    return _capture_tmux_output_bytes(session_name, lines)
+
+
+def _session_alive(session_name: str, control: Optional[_TmuxControl]) -> bool:
+    """
+    Check if the session still exists without forking tmux when possible.
+
+    An open control client is attached to the session, so the session is
+    alive until the client's reader thread sees it go away. Otherwise a
+    positive has-session result is reused for SESSION_CHECK_TTL seconds.
+    """
+    if control is not None and not control.closed:
+        return True
+
+    now = time.monotonic()
+    if now - _session_check_cache.get(session_name, float("-inf")) < SESSION_CHECK_TTL:
+        return True
+    if not session_exists(session_name):
+        _session_check_cache.pop(session_name, None)
+        return False
+    _session_check_cache[session_name] = now
+    return True
+
+
+def _ends_with_prompt(output: bytes) -> bool:
+    """Check if the last non-blank line of the output ends with a prompt pattern."""
+    window = output[-PROMPT_SEARCH_WINDOW:]
+    if _PROMPT_END.search(window):
+        return True
+
+    # Other escape sequences (e.g. inside the prompt itself) need a full strip of the last line
+    if b"\x1b" not in window:
+        return False
+    last_line = output.rstrip().rpartition(b'\n')[2]
+    return strip_ansi_escape_sequences(last_line).rstrip().endswith(_PROMPT_TUPLE)
+
+
+def _trim_output_to_command(output: bytes, command: Optional[bytes]) -> bytes:
     """
     Trim output to only show from the command onwards.
     If command is not found, return the full output.
@@ -135,26 +790,30 @@ def _trim_output_to_command(output: str, command: Optional[str]) -> str:
     if not command or not output:
         return output
 
-    # Find the command in the output
-    lines = output.split('\n')
-    for idx in range(len(lines) - 1, -1, -1):
-        if command in lines[idx]:
-            # Return everything from this line onwards
-            return '\n'.join(lines[idx:])
+    # Find the last occurrence of the command in the output
+    pos = output.rfind(command)
+    if pos < 0:
+        # If command not found, return full output
+        return output
 
-    # If command not found, return full output
-    return output
+    # Return everything from the start of that line onwards
+    return output[output.rfind(b'\n', 0, pos) + 1:]
 
 
-def strip_ansi_escape_sequences(text: str) -> str:
-    """Remove ANSI escape sequences from text."""
-    return ANSI_ESCAPE_PATTERN.sub("", text)
+def strip_ansi_escape_sequences(text: bytes) -> bytes:
+    """Remove ANSI escape sequences from raw pane output."""
+    # Most lines have no escape sequences at all; skip the regex for those. Every
+    # match starts with ESC, and in UTF-8 bytes 0x9b is a common continuation
+    # byte rather than a CSI introducer, so ESC is the only byte worth testing
+    if b"\x1b" not in text:
+        return text
+    return ANSI_ESCAPE_PATTERN.sub(b"", text)
 
 
 def session_exists(session_name: str) -> bool:
     """Check if a tmux session exists."""
     result = subprocess.run(
-        ["tmux", "has-session", "-t", session_name],
+        [TMUX_PATH, "has-session", "-t", session_name],
         capture_output=True,
         text=True
     )
@@ -171,11 +830,23 @@ def cli():
 @click.option("-t", "--target-session", required=True, help="Target session name")
 @click.option("--no-enter", is_flag=True, help="Don't send Enter key after command")
 @click.option("--timeout", type=int, default=60, help="Maximum wait time in seconds (default: 60)")
+@click.option("--no-control-mode", is_flag=True, help="Poll with a tmux subprocess per check instead of a control-mode client")
+@click.option("--no-pane-stream", is_flag=True, help="Don't stream pane output through pipe-pane; rely on polling alone")
+@click.option(
+    "--sentinel",
+    is_flag=True,
+    help="Detect completion by echoing a unique marker after the command (shell commands only; "
+         "commands ending in '&', ';', '|' or a comment are not supported; $? is kept, "
+         "a __twrc shell variable is left set)"
+)
 @click.argument("keys", required=True)
 def send_keys(
     target_session: str,
     no_enter: bool,
     timeout: int,
+    no_control_mode: bool,
+    no_pane_stream: bool,
+    sentinel: bool,
     keys: str
 ):
     """
@@ -184,37 +855,80 @@ def send_keys(
     Example:
         tmux_wrapper.py send-keys -t mysession "echo hello && sleep 1 && echo world"
         tmux_wrapper.py send-keys -t mysession --timeout 120 "long running command"
+        tmux_wrapper.py send-keys -t mysession --sentinel "make test"
     """
-    # Check if session exists
-    if not session_exists(target_session):
-        click.echo(f"Error: Session '{target_session}' does not exist", err=True)
-        sys.exit(1)
+    # A sentinel can only be printed once the command actually runs
+    completion_sentinel = None
+    sent_keys = keys
+    if sentinel and not no_enter:
+        reason = _sentinel_unsupported(keys)
+        if reason is not None:
+            click.echo(f"Error: --sentinel cannot be used with a command that {reason}", err=True)
+            sys.exit(1)
+        completion_sentinel = f"{SENTINEL_PREFIX}{uuid.uuid4().hex[:8]}__"
+        sent_keys = keys + _sentinel_suffix(completion_sentinel)
 
-    # Capture the current pane contents before sending the command
-    pre_command_output = capture_tmux_output(target_session)
+    # Start attaching the control client now so it overlaps the tmux call below
+    control = None if no_control_mode else _TmuxControl.start(target_session)
 
-    # Build tmux send-keys command
-    tmux_cmd = ["tmux", "send-keys", "-t", target_session, keys]
-    if not no_enter:
-        tmux_cmd.append("C-m")  # Send Enter
+    # Stream pane output so the prompt that follows the command wakes the wait right away
+    pane_stream = None
+    if not no_pane_stream:
+        try:
+            pane_stream = _PaneStream(target_session)
+        except OSError:
+            pane_stream = None
 
-    # Send keys
     try:
-        result = subprocess.run(tmux_cmd, capture_output=True, text=True, timeout=5)
+        # One tmux invocation checks the session, starts the pane stream,
+        # captures the current pane contents and sends the keys; tmux stops at
+        # the first failing command, so a missing session sends nothing
+        tmux_cmd = ["tmux", "has-session", "-t", target_session, ";"]
+        if pane_stream is not None:
+            tmux_cmd += ["display-message", "-p", "-t", target_session, "#{pane_pipe}", ";"]
+            tmux_cmd += pane_stream.pipe_command() + [";"]
+        tmux_cmd += ["capture-pane", "-t", target_session, "-p", "-S", f"-{POLL_CAPTURE_LINES}", ";"]
+        tmux_cmd += ["send-keys", "-t", target_session, sent_keys]
+        if not no_enter:
+            tmux_cmd.append("C-m")  # Send Enter
+
+        try:
+            result = subprocess.run(tmux_cmd, capture_output=True, timeout=5)
+        except subprocess.TimeoutExpired:
+            click.echo("Error: tmux send-keys command timed out", err=True)
+            sys.exit(1)
         if result.returncode != 0:
-            click.echo(f"Error sending keys: {result.stderr}", err=True)
+            # has-session is the only command that runs without printing anything
+            if not result.stdout:
+                click.echo(f"Error: Session '{target_session}' does not exist", err=True)
+            else:
+                click.echo(f"Error sending keys: {result.stderr.decode('utf-8', errors='replace')}", err=True)
             sys.exit(1)
-    except subprocess.TimeoutExpired:
-        click.echo("Error: tmux send-keys command timed out", err=True)
-        sys.exit(1)
 
-    # Wait for prompt to appear
-    output, timed_out, session_exited = wait_for_output_completion(
-        target_session,
-        keys,
-        max_wait_sec=timeout,
-        pre_command_output=pre_command_output
-    )
+        # The pane contents from before the command was sent
+        pre_command_output = result.stdout
+        if pane_stream is not None:
+            pane_pipe, _, pre_command_output = pre_command_output.partition(b"\n")
+            if pane_pipe != b"0":
+                pane_stream.close(stop_pipe=False)
+                pane_stream = None
+
+        # Wait for prompt to appear
+        output, timed_out, session_exited = wait_for_output_completion(
+            target_session,
+            keys,
+            max_wait_sec=timeout,
+            pre_command_output=pre_command_output,
+            use_control_mode=not no_control_mode,
+            pane_stream=pane_stream,
+            completion_sentinel=completion_sentinel,
+            control=control
+        )
+    finally:
+        if pane_stream is not None:
+            pane_stream.close(control=control)
+        if control is not None:
+            control.close()
 
     # Print output
     click.echo(output, nl=False)